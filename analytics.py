@@ -0,0 +1,177 @@
+"""
+analytics.py — Sales aggregation over `order_items`.
+Orders are read in keyset pages on (created_at, id), each with its items
+embedded, and folded into columnar NumPy totals per (product, day).
+Totals are kept in memory with the last seen (created_at, id) as a
+watermark, so each refresh only reads orders placed since the last one.
+Orders younger than ANALYTICS_SETTLE_SECONDS are left for a later refresh,
+so a transaction that commits late cannot land behind the watermark.
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from config import get_db, get_settings
+
+ORDER_COLUMNS = "id,created_at,status,order_items(id,product_id,quantity,unit_price,products(category))"
+ORDER_KEY = ("created_at", "id")
+EXPORT_FIELDS = ("id", "order_id", "product_id", "quantity", "unit_price", "created_at", "status", "category")
+
+
+def _flatten(order: dict) -> list[dict]:
+    return [
+        {
+            "id": item["id"],
+            "order_id": order["id"],
+            "product_id": item.get("product_id"),
+            "quantity": item.get("quantity") or 0,
+            "unit_price": item.get("unit_price") or 0,
+            "created_at": order.get("created_at"),
+            "status": order.get("status"),
+            "category": (item.get("products") or {}).get("category"),
+        }
+        for item in order.get("order_items") or []
+    ]
+
+
+def iter_order_pages(after=None, until: str | None = None, batch_size: int | None = None):
+    """Yields pages of orders (items embedded) in (created_at, id) order."""
+    size = batch_size or get_settings().analytics_batch_size
+    filters = {"created_at": f"lt.{until}"} if until else None
+    yield from get_db().iter_pages("orders", columns=ORDER_COLUMNS, filters=filters,
+                                   key=ORDER_KEY, after=after, batch_size=size)
+
+
+def iter_items(batch_size: int | None = None):
+    """Yields flattened order_items pages, whole orders at a time."""
+    for page in iter_order_pages(batch_size=batch_size):
+        yield [row for order in page for row in _flatten(order)]
+
+
+class SalesAnalytics:
+    """
+    Columnar running totals keyed by (product code, day number).
+    `refresh` is incremental; reads of the totals are vectorised bincounts.
+    """
+
+    def __init__(self):
+        self.watermark = None
+        self._lock = threading.Lock()
+        self._product_ids: list[str] = []
+        self._categories: list[str | None] = []
+        self._product_codes: dict[str, int] = {}
+        self._cell_index: dict[tuple[int, int], int] = {}
+        self._pcode = np.empty(0, dtype=np.int64)
+        self._day = np.empty(0, dtype=np.int64)
+        self._units = np.empty(0, dtype=np.float64)
+        self._revenue = np.empty(0, dtype=np.float64)
+
+    # ── Ingest ───────────────────────────────────────────────────────────────
+
+    def _code(self, product_id: str, category: str | None) -> int:
+        code = self._product_codes.get(product_id)
+        if code is None:
+            code = len(self._product_ids)
+            self._product_codes[product_id] = code
+            self._product_ids.append(product_id)
+            self._categories.append(category)
+        elif category and not self._categories[code]:
+            self._categories[code] = category
+        return code
+
+    def _ingest(self, rows: list[dict]) -> None:
+        rows = [r for r in rows if r["created_at"] and r["product_id"]]
+        if not rows:
+            return
+        pcode = np.fromiter((self._code(r["product_id"], r["category"]) for r in rows),
+                            dtype=np.int64, count=len(rows))
+        day = np.array([r["created_at"][:10] for r in rows], dtype="datetime64[D]").astype(np.int64)
+        qty = np.fromiter((r["quantity"] for r in rows), dtype=np.float64, count=len(rows))
+        price = np.fromiter((r["unit_price"] for r in rows), dtype=np.float64, count=len(rows))
+
+        cells, inverse = np.unique(np.stack([pcode, day], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        units = np.bincount(inverse, weights=qty, minlength=len(cells))
+        revenue = np.bincount(inverse, weights=qty * price, minlength=len(cells))
+
+        existing = np.empty(len(cells), dtype=np.int64)
+        new_cells = []
+        for i, (p, d) in enumerate(cells.tolist()):
+            idx = self._cell_index.get((p, d))
+            if idx is None:
+                idx = len(self._pcode) + len(new_cells)
+                self._cell_index[(p, d)] = idx
+                new_cells.append((p, d))
+            existing[i] = idx
+        if new_cells:
+            added = np.array(new_cells, dtype=np.int64)
+            self._pcode = np.concatenate([self._pcode, added[:, 0]])
+            self._day = np.concatenate([self._day, added[:, 1]])
+            self._units = np.concatenate([self._units, np.zeros(len(added))])
+            self._revenue = np.concatenate([self._revenue, np.zeros(len(added))])
+        np.add.at(self._units, existing, units)
+        np.add.at(self._revenue, existing, revenue)
+
+    def refresh(self) -> None:
+        """Folds in every settled order past the watermark."""
+        with self._lock:
+            settle = timedelta(seconds=get_settings().analytics_settle_seconds)
+            until = (datetime.now(timezone.utc) - settle).isoformat()
+            for page in iter_order_pages(after=self.watermark, until=until):
+                self._ingest([row for order in page for row in _flatten(order)])
+                self.watermark = (page[-1]["created_at"], page[-1]["id"])
+
+    # ── Reports ──────────────────────────────────────────────────────────────
+
+    def _window(self, since: str | None, until: str | None) -> np.ndarray:
+        mask = np.ones(len(self._day), dtype=bool)
+        if since:
+            mask &= self._day >= np.datetime64(since, "D").astype(np.int64)
+        if until:
+            mask &= self._day <= np.datetime64(until, "D").astype(np.int64)
+        return mask
+
+    def report(self, group: str, since: str | None = None, until: str | None = None) -> list[dict]:
+        """Units and revenue grouped by `product`, `category`, `day` or `product_day`."""
+        with self._lock:
+            mask = self._window(since, until)
+            pcode, day = self._pcode[mask], self._day[mask]
+            units, revenue = self._units[mask], self._revenue[mask]
+
+            if group == "product_day":
+                return [
+                    {"product_id": self._product_ids[p], "day": str(np.datetime64(d, "D")),
+                     "units": int(u), "revenue": round(float(r), 2)}
+                    for p, d, u, r in sorted(zip(pcode.tolist(), day.tolist(),
+                                                 units.tolist(), revenue.tolist()),
+                                             key=lambda c: (c[1], c[0]))
+                ]
+
+            if group == "product":
+                labels = self._product_ids
+                codes = pcode
+            elif group == "category":
+                labels = sorted({c or "uncategorized" for c in self._categories})
+                lookup = {c: i for i, c in enumerate(labels)}
+                by_product = np.array([lookup[c or "uncategorized"] for c in self._categories],
+                                      dtype=np.int64)
+                codes = by_product[pcode] if len(pcode) else pcode
+            elif group == "day":
+                if not len(day):
+                    return []
+                base = int(day.min())
+                codes = day - base
+                labels = [str(np.datetime64(base + i, "D")) for i in range(int(codes.max()) + 1)]
+            else:
+                raise ValueError(f"Unknown group '{group}'")
+
+            n = len(labels)
+            u = np.bincount(codes, weights=units, minlength=n)
+            r = np.bincount(codes, weights=revenue, minlength=n)
+            return [
+                {group: labels[i], "units": int(u[i]), "revenue": round(float(r[i]), 2)}
+                for i in np.flatnonzero(u).tolist()
+            ]
+
+
+sales = SalesAnalytics()
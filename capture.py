@@ -0,0 +1,150 @@
+"""
+capture.py — Traffic capture for replay-based performance tests.
+With CAPTURE_PATH set, every sampled request is appended to that file as
+one JSON line: route, path, query, sanitized body, status and timing.
+CAPTURE_UPSTREAM=true also records the PostgREST/GoTrue responses each
+request triggered, so replay.py can serve them from a mock upstream.
+Sensitive fields are masked; tokens are stored only as short hashes.
+"""
+
+import hashlib
+import json
+import random
+import threading
+from contextvars import ContextVar
+import httpx
+from config import get_settings, get_http_client, get_async_http_client
+
+REDACTED = "<redacted>"
+SENSITIVE_KEYS = {
+    "password", "access_token", "refresh_token", "token", "email", "phone",
+    "full_name", "address_line1", "address_line2", "city", "state", "pincode", "apikey",
+}
+SKIP_PREFIXES = ("/health", "/ready", "/admin", "/products/stream", "/docs", "/openapi.json")
+# Sent by in-process callers (batch, warm-up) so their sub-requests are not recorded twice
+INTERNAL_HEADER = "X-Internal-Request"
+
+_upstream_calls: ContextVar[list | None] = ContextVar("upstream_calls", default=None)
+
+
+def sanitize(value):
+    """Masks sensitive keys at any depth while keeping the document's shape."""
+    if isinstance(value, dict):
+        return {k: REDACTED if k.lower() in SENSITIVE_KEYS else sanitize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [sanitize(v) for v in value]
+    return value
+
+
+def token_hash(authorization: str | None) -> str | None:
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()[:12]
+
+
+class Recorder:
+    def __init__(self):
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    # ── Lifecycle ────────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        s = get_settings()
+        if not s.capture_path:
+            return
+        self._file = open(s.capture_path, "a", encoding="utf-8", buffering=1)
+        if s.capture_upstream:
+            get_http_client().event_hooks["response"].append(_record_upstream)
+            get_async_http_client().event_hooks["response"].append(_arecord_upstream)
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    # ── Recording ────────────────────────────────────────────────────────────
+
+    def wants(self, path: str, headers) -> bool:
+        if not self._file or INTERNAL_HEADER.lower() in headers:
+            return False
+        if path.startswith(SKIP_PREFIXES):
+            return False
+        return random.random() < get_settings().capture_sample_rate
+
+    def begin(self) -> None:
+        """Starts collecting upstream calls for the current request."""
+        if get_settings().capture_upstream:
+            _upstream_calls.set([])
+
+    def write(self, record: dict) -> None:
+        record["upstream"] = _upstream_calls.get()
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._file:
+                self._file.write(line)
+
+
+def _upstream_entry(response: httpx.Response) -> dict:
+    try:
+        body = sanitize(response.json())
+    except ValueError:
+        body = None
+    try:
+        elapsed_ms = round(response.elapsed.total_seconds() * 1000, 2)
+    except RuntimeError:
+        elapsed_ms = 0.0  # stream not closed yet (pre-loaded response content)
+    return {
+        "method": response.request.method,
+        "path": response.request.url.path,
+        "query": str(response.request.url.params),
+        "status": response.status_code,
+        "elapsed_ms": elapsed_ms,
+        "body": body,
+    }
+
+
+def _record_upstream(response: httpx.Response) -> None:
+    calls = _upstream_calls.get()
+    if calls is not None:
+        response.read()
+        calls.append(_upstream_entry(response))
+
+
+async def _arecord_upstream(response: httpx.Response) -> None:
+    calls = _upstream_calls.get()
+    if calls is not None:
+        await response.aread()
+        calls.append(_upstream_entry(response))
+
+
+def route_template(request) -> str:
+    """The matched route's template, e.g. /products/{product_id}, for grouping."""
+    route = request.scope.get("route")
+    return getattr(route, "path", request.url.path)
+
+
+def build_record(request, body: bytes, status: int, start: float, end: float, started_at: float) -> dict:
+    try:
+        parsed = sanitize(json.loads(body)) if body else None
+    except ValueError:
+        parsed = None
+    return {
+        "ts": started_at,
+        "method": request.method,
+        "route": route_template(request),
+        "path": request.url.path,
+        "query": dict(request.query_params),
+        "auth": token_hash(request.headers.get("authorization")),
+        "body": parsed,
+        "status": status,
+        "duration_ms": round((end - start) * 1000, 2),
+    }
+
+
+recorder = Recorder()
@@ -0,0 +1,118 @@
+"""
+catalog.py — Per-process product catalog feed.
+One poller per process reads the `products` table and fans out
+stock / price / rating changes to every subscribed SSE connection.
+"""
+
+import asyncio
+from config import get_db, get_settings
+
+# Fields whose changes are pushed to subscribers.
+TRACKED_FIELDS = ("price", "stock_quantity", "rating")
+
+
+class Subscription:
+    """
+    One client's view of the feed.
+    Pending changes are coalesced per product, so a slow or idle client
+    costs one Event and a dict no larger than the catalog.
+    """
+
+    __slots__ = ("pending", "event")
+
+    def __init__(self):
+        self.pending: dict[str, dict] = {}
+        self.event = asyncio.Event()
+
+    def push(self, delta: dict[str, dict]) -> None:
+        for product_id, fields in delta.items():
+            self.pending.setdefault(product_id, {}).update(fields)
+        self.event.set()
+
+    async def next(self, timeout: float) -> dict[str, dict]:
+        """Waits for changes; returns an empty dict on timeout."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self.event.clear()
+        pending, self.pending = self.pending, {}
+        return pending
+
+
+class CatalogFeed:
+    """
+    Holds the latest product rows and diffs each poll against them.
+    The poll task only runs while at least one client is subscribed.
+    """
+
+    def __init__(self):
+        self.products: dict[str, dict] = {}
+        self._subscribers: set[Subscription] = set()
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    # ── Snapshot ─────────────────────────────────────────────────────────────
+
+    def get(self, product_id: str) -> dict | None:
+        return self.products.get(product_id)
+
+    def tracked_snapshot(self) -> dict[str, dict]:
+        return {
+            pid: {f: row.get(f) for f in TRACKED_FIELDS}
+            for pid, row in self.products.items()
+        }
+
+    async def refresh(self) -> dict[str, dict]:
+        """Reads the table once, stores it and returns the tracked-field delta."""
+        async with self._lock:
+            rows = await asyncio.to_thread(get_db().select, "products") or []
+            fresh = {row["id"]: row for row in rows}
+            delta: dict[str, dict] = {}
+            for pid, row in fresh.items():
+                old = self.products.get(pid)
+                changed = {
+                    f: row.get(f) for f in TRACKED_FIELDS
+                    if old is None or old.get(f) != row.get(f)
+                }
+                if changed:
+                    delta[pid] = changed
+            for pid in self.products.keys() - fresh.keys():
+                delta[pid] = {"removed": True}
+            self.products = fresh
+            return delta
+
+    # ── Fan-out ──────────────────────────────────────────────────────────────
+
+    def subscribe(self) -> Subscription:
+        sub = Subscription()
+        self._subscribers.add(sub)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll_loop())
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self._subscribers.discard(sub)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def publish(self, delta: dict[str, dict]) -> None:
+        if not delta:
+            return
+        for sub in self._subscribers:
+            sub.push(delta)
+
+    async def _poll_loop(self) -> None:
+        interval = get_settings().catalog_poll_interval
+        while self._subscribers:
+            try:
+                self.publish(await self.refresh())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass  # Upstream hiccup — keep the last snapshot and retry
+            await asyncio.sleep(interval)
+
+
+feed = CatalogFeed()
@@ -17,6 +17,33 @@ class Settings:
     supabase_service_key: str = os.environ["SUPABASE_SERVICE_KEY"]
     supabase_jwt_secret: str = os.environ["SUPABASE_JWT_SECRET"]
     frontend_url: str = os.environ.get("FRONTEND_URL", "http://localhost:3000")
+    catalog_poll_interval: float = float(os.environ.get("CATALOG_POLL_INTERVAL", "2"))
+    job_queue_db: str = os.environ.get("JOB_QUEUE_DB", "")
+    job_max_attempts: int = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+    job_retry_base_delay: float = float(os.environ.get("JOB_RETRY_BASE_DELAY", "1"))
+    upstream_timeout: float = float(os.environ.get("UPSTREAM_TIMEOUT", "10"))
+    upstream_pool_size: int = int(os.environ.get("UPSTREAM_POOL_SIZE", "20"))
+    warmup_connections: int = int(os.environ.get("WARMUP_CONNECTIONS", "4"))
+    warmup_routes: bool = os.environ.get("WARMUP_ROUTES", "true").lower() in ("1", "true", "yes")
+    admin_api_key: str = os.environ.get("ADMIN_API_KEY", "")
+    analytics_batch_size: int = int(os.environ.get("ANALYTICS_BATCH_SIZE", "1000"))
+    analytics_settle_seconds: float = float(os.environ.get("ANALYTICS_SETTLE_SECONDS", "300"))
+    recommendations_top_k: int = int(os.environ.get("RECOMMENDATIONS_TOP_K", "10"))
+    token_cache_ttl: float = float(os.environ.get("TOKEN_CACHE_TTL", "30"))
+    batch_max_requests: int = int(os.environ.get("BATCH_MAX_REQUESTS", "20"))
+    batch_timeout: float = float(os.environ.get("BATCH_TIMEOUT", "10"))
+    reservation_ttl: float = float(os.environ.get("RESERVATION_TTL", "900"))
+    reservation_reconcile_interval: float = float(os.environ.get("RESERVATION_RECONCILE_INTERVAL", "30"))
+    profiler_enabled: bool = os.environ.get("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+    profiler_sample_rate: float = float(os.environ.get("PROFILER_SAMPLE_RATE", "0.01"))
+    profiler_slow_ms: float = float(os.environ.get("PROFILER_SLOW_MS", "500"))
+    profiler_interval_ms: float = float(os.environ.get("PROFILER_INTERVAL_MS", "5"))
+    profiler_keep: int = int(os.environ.get("PROFILER_KEEP", "50"))
+    loop_block_ms: float = float(os.environ.get("LOOP_BLOCK_MS", "250"))
+    capture_path: str = os.environ.get("CAPTURE_PATH", "")
+    capture_sample_rate: float = float(os.environ.get("CAPTURE_SAMPLE_RATE", "1"))
+    capture_upstream: bool = os.environ.get("CAPTURE_UPSTREAM", "false").lower() in ("1", "true", "yes")
+    sse_keepalive_interval: float = float(os.environ.get("SSE_KEEPALIVE_INTERVAL", "15"))
 
 
 @lru_cache()
@@ -24,6 +51,42 @@ def get_settings() -> Settings:
     return Settings()
 
 
+# Set by replay.py to serve recorded upstream responses instead of the network.
+_upstream_transport: httpx.BaseTransport | None = None
+_async_upstream_transport: httpx.AsyncBaseTransport | None = None
+
+
+def use_upstream_transports(sync: httpx.BaseTransport, async_: httpx.AsyncBaseTransport) -> None:
+    global _upstream_transport, _async_upstream_transport
+    _upstream_transport, _async_upstream_transport = sync, async_
+    get_http_client.cache_clear()
+    get_async_http_client.cache_clear()
+
+
+@lru_cache()
+def get_http_client() -> httpx.Client:
+    """Process-wide keep-alive pool for PostgREST and GoTrue calls."""
+    s = get_settings()
+    return httpx.Client(
+        transport=_upstream_transport,
+        timeout=s.upstream_timeout,
+        limits=httpx.Limits(max_connections=s.upstream_pool_size * 2,
+                            max_keepalive_connections=s.upstream_pool_size),
+    )
+
+
+@lru_cache()
+def get_async_http_client() -> httpx.AsyncClient:
+    """Async counterpart of get_http_client, used by request dependencies."""
+    s = get_settings()
+    return httpx.AsyncClient(
+        transport=_async_upstream_transport,
+        timeout=s.upstream_timeout,
+        limits=httpx.Limits(max_connections=s.upstream_pool_size * 2,
+                            max_keepalive_connections=s.upstream_pool_size),
+    )
+
+
 def get_db(admin: bool = True) -> "SupabaseDB":
     """Returns an http-based DB client."""
     return SupabaseDB(admin=admin)
@@ -63,41 +126,63 @@ class SupabaseDB:
         headers = dict(self._headers)
         if single:
             headers["Accept"] = "application/vnd.pgrst.object+json"
-        with httpx.Client() as client:
-            r = client.get(self._url(table), params=params, headers=headers)
-            if r.status_code == 406:
-                return None  # single row not found
-            r.raise_for_status()
-            return r.json()
+        r = get_http_client().get(self._url(table), params=params, headers=headers)
+        if r.status_code == 406:
+            return None  # single row not found
+        r.raise_for_status()
+        return r.json()
 
     def insert(self, table: str, data: dict | list) -> list:
-        with httpx.Client() as client:
-            r = client.post(self._url(table), json=data, headers=self._headers)
-            r.raise_for_status()
-            return r.json()
+        r = get_http_client().post(self._url(table), json=data, headers=self._headers)
+        r.raise_for_status()
+        return r.json()
 
     def update(self, table: str, data: dict, filters: dict) -> list:
         params = dict(filters)
-        with httpx.Client() as client:
-            r = client.patch(self._url(table), json=data, params=params, headers=self._headers)
-            r.raise_for_status()
-            return r.json()
+        r = get_http_client().patch(self._url(table), json=data, params=params, headers=self._headers)
+        r.raise_for_status()
+        return r.json()
 
     def delete(self, table: str, filters: dict) -> list:
         params = dict(filters)
-        with httpx.Client() as client:
-            r = client.delete(self._url(table), params=params, headers=self._headers)
-            r.raise_for_status()
-            return r.json()
+        r = get_http_client().delete(self._url(table), params=params, headers=self._headers)
+        r.raise_for_status()
+        return r.json()
 
     def upsert(self, table: str, data: dict | list, on_conflict: str = "id") -> list:
         headers = dict(self._headers)
         headers["Prefer"] = f"return=representation,resolution=merge-duplicates"
         params = {"on_conflict": on_conflict}
-        with httpx.Client() as client:
-            r = client.post(self._url(table), json=data, params=params, headers=headers)
-            r.raise_for_status()
-            return r.json()
+        r = get_http_client().post(self._url(table), json=data, params=params, headers=headers)
+        r.raise_for_status()
+        return r.json()
+
+    def iter_pages(self, table: str, columns: str = "*", filters: dict | None = None,
+                   key: str | tuple[str, str] = "id", after=None, batch_size: int = 1000):
+        """
+        Keyset pagination: yields lists of rows ordered by `key`, each page
+        starting after the last key of the previous one. `key` may be one
+        column or a (column, tiebreaker) pair such as ("created_at", "id"),
+        in which case `after` is a tuple too (and an `or` filter is used).
+        `after` resumes from a known key. Never holds more than one page in memory.
+        """
+        keys = (key,) if isinstance(key, str) else tuple(key)
+        while True:
+            params = dict(filters or {})
+            if after is not None and len(keys) == 1:
+                params[keys[0]] = f"gt.{after}"
+            elif after is not None:
+                (k1, k2), (v1, v2) = keys, after
+                params["or"] = f'({k1}.gt."{v1}",and({k1}.eq."{v1}",{k2}.gt."{v2}"))'
+            page = self.select(table, columns=columns, filters=params,
+                               order=",".join(f"{k}.asc" for k in keys), limit=batch_size) or []
+            if not page:
+                return
+            yield page
+            if len(page) < batch_size:
+                return
+            last = page[-1]
+            after = last[keys[0]] if len(keys) == 1 else tuple(last[k] for k in keys)
 
     # ── Auth helpers ─────────────────────────────────────────────────────────
 
@@ -111,16 +196,9 @@ class SupabaseDB:
             "apikey": s.supabase_anon_key,
             "Content-Type": "application/json",
         }
-        with httpx.Client() as client:
-            r = client.post(url, json=body, headers=headers)
-            if not r.is_success:
-                try:
-                    data = r.json()
-                    msg = data.get("error_description") or data.get("msg") or data.get("message") or r.text
-                except Exception:
-                    msg = r.text
-                raise Exception(msg)
-            return r.json()
+        r = get_http_client().post(url, json=body, headers=headers)
+        _raise_for_auth_error(r)
+        return r.json()
 
     def auth_login(self, email: str, password: str) -> dict:
         s = get_settings()
@@ -130,13 +208,38 @@ class SupabaseDB:
             "apikey": s.supabase_anon_key,
             "Content-Type": "application/json",
         }
-        with httpx.Client() as client:
-            r = client.post(url, json=body, headers=headers)
-            if not r.is_success:
-                try:
-                    data = r.json()
-                    msg = data.get("error_description") or data.get("msg") or data.get("message") or r.text
-                except Exception:
-                    msg = r.text
-                raise Exception(msg)
-            return r.json()
+        r = get_http_client().post(url, json=body, headers=headers)
+        _raise_for_auth_error(r)
+        return r.json()
+
+    def auth_refresh(self, refresh_token: str) -> dict:
+        s = get_settings()
+        url = f"{s.supabase_url}/auth/v1/token?grant_type=refresh_token"
+        headers = {
+            "apikey": s.supabase_anon_key,
+            "Content-Type": "application/json",
+        }
+        r = get_http_client().post(url, json={"refresh_token": refresh_token}, headers=headers)
+        _raise_for_auth_error(r)
+        return r.json()
+
+    def auth_logout(self, access_token: str) -> None:
+        """Revokes the session behind `access_token` (and its refresh token)."""
+        s = get_settings()
+        url = f"{s.supabase_url}/auth/v1/logout?scope=local"
+        headers = {
+            "apikey": s.supabase_anon_key,
+            "Authorization": f"Bearer {access_token}",
+        }
+        r = get_http_client().post(url, headers=headers)
+        _raise_for_auth_error(r)
+
+
+def _raise_for_auth_error(r: httpx.Response) -> None:
+    if not r.is_success:
+        try:
+            data = r.json()
+            msg = data.get("error_description") or data.get("msg") or data.get("message") or r.text
+        except Exception:
+            msg = r.text
+        raise Exception(msg)
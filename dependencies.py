@@ -1,28 +1,99 @@
-import httpx
-from fastapi import Depends, HTTPException, status
+import secrets
+import threading
+import time
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from config import get_settings
+from config import get_settings, get_async_http_client
 
 security = HTTPBearer()
 
+# token -> (expires_at, user). Successful GoTrue validations are reused for
+# TOKEN_CACHE_TTL seconds so one client's burst of requests costs one lookup.
+_token_cache: dict[str, tuple[float, dict]] = {}
+_TOKEN_CACHE_MAX = 10_000
+# token -> expires_at. Logged-out tokens, remembered for one cache TTL so an
+# in-flight validation cannot put them back into the cache.
+_revoked: dict[str, float] = {}
+# Both dicts are touched from the event loop and from threadpool handlers (logout)
+_cache_lock = threading.Lock()
+
+
+def _revoked_locked(token: str) -> bool:
+    expires_at = _revoked.get(token)
+    if expires_at is None:
+        return False
+    if expires_at < time.monotonic():
+        del _revoked[token]
+        return False
+    return True
+
+
+def _is_revoked(token: str) -> bool:
+    with _cache_lock:
+        return _revoked_locked(token)
+
+
+def revoke_token(token: str) -> None:
+    """Drops a logged-out token from this process's validation cache."""
+    ttl = get_settings().token_cache_ttl
+    with _cache_lock:
+        _token_cache.pop(token, None)
+        if ttl > 0:
+            now = time.monotonic()
+            for t in [t for t, exp in _revoked.items() if exp < now]:
+                del _revoked[t]
+            _revoked[token] = now + ttl
+
+
+def _cache_user(token: str, user: dict) -> None:
+    ttl = get_settings().token_cache_ttl
+    if ttl <= 0:
+        return
+    with _cache_lock:
+        if _revoked_locked(token):
+            return
+        if len(_token_cache) >= _TOKEN_CACHE_MAX:
+            _token_cache.pop(next(iter(_token_cache)))  # oldest insertion
+        _token_cache[token] = (time.monotonic() + ttl, user)
+
+
+def _cached_user(token: str) -> dict | None:
+    with _cache_lock:
+        hit = _token_cache.get(token)
+        if hit is None:
+            return None
+        if hit[0] < time.monotonic():
+            del _token_cache[token]
+            return None
+        return hit[1]
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> dict:
     """
     Validates the Supabase JWT by calling the GoTrue /user endpoint.
     This guarantees the token is cryptographically valid and not revoked.
+    Successful results are cached per token for TOKEN_CACHE_TTL seconds.
     """
     settings = get_settings()
     token = credentials.credentials
-
-    async with httpx.AsyncClient() as client:
-        res = await client.get(
-            f"{settings.supabase_url}/auth/v1/user",
-            headers={
-                "apikey": settings.supabase_anon_key,
-                "Authorization": f"Bearer {token}",
-            }
+    if _is_revoked(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
         )
+    cached = _cached_user(token)
+    if cached is not None:
+        return cached
+
+    res = await get_async_http_client().get(
+        f"{settings.supabase_url}/auth/v1/user",
+        headers={
+            "apikey": settings.supabase_anon_key,
+            "Authorization": f"Bearer {token}",
+        }
+    )
 
     if res.status_code != 200:
         raise HTTPException(
@@ -33,7 +104,7 @@ async def get_current_user(
     user_data = res.json()
     user_id = user_data.get("id")
     
-    return {
+    user = {
         "id": user_id, 
         "email": user_data.get("email"), 
         "payload": {
@@ -42,6 +113,8 @@ async def get_current_user(
             "access_token": token
         }
     }
+    _cache_user(token, user)
+    return user
 
 
 async def get_optional_user(
@@ -57,3 +130,13 @@ async def get_optional_user(
         return await get_current_user(credentials)
     except HTTPException:
         return None
+
+
+async def require_admin(x_admin_key: str | None = Header(None)) -> None:
+    """
+    Guards admin endpoints with the shared ADMIN_API_KEY.
+    Admin routes are disabled entirely when no key is configured.
+    """
+    expected = get_settings().admin_api_key
+    if not expected or not x_admin_key or not secrets.compare_digest(x_admin_key, expected):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
@@ -0,0 +1,226 @@
+"""
+jobs.py — In-process background job queue.
+Request handlers enqueue work and return immediately; per-kind workers
+run it off the request path with batching and retry/backoff.
+Set JOB_QUEUE_DB to a file path to persist pending jobs in SQLite.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable
+from config import get_settings
+
+
+@dataclass
+class Job:
+    kind: str
+    payload: dict
+    id: int | None = None
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class _Handler:
+    fn: Callable[[list[dict]], None]
+    batch_size: int
+    queue: asyncio.Queue | None = None
+    task: asyncio.Task | None = None
+
+
+class _Store:
+    """SQLite backing for jobs that have not completed yet."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL DEFAULT 'pending', "
+                "enqueued_at REAL NOT NULL)"
+            )
+
+    def add(self, job: Job) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO jobs (kind, payload, attempts, enqueued_at) VALUES (?, ?, ?, ?)",
+                (job.kind, json.dumps(job.payload), job.attempts, job.enqueued_at),
+            )
+            return cur.lastrowid
+
+    def done(self, ids: list[int]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in ids])
+
+    def retry(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET attempts = ? WHERE id = ?", (job.attempts, job.id))
+
+    def fail(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET attempts = ?, status = 'failed' WHERE id = ?", (job.attempts, job.id)
+            )
+
+    def pending(self) -> list[Job]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, payload, attempts, enqueued_at FROM jobs "
+                "WHERE status = 'pending' ORDER BY id"
+            ).fetchall()
+        return [Job(kind=k, payload=json.loads(p), id=i, attempts=a, enqueued_at=t)
+                for i, k, p, a, t in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    One asyncio queue and worker task per registered job kind.
+    `enqueue` is safe to call from the event loop or from worker threads.
+    """
+
+    def __init__(self):
+        self._handlers: dict[str, _Handler] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._store: _Store | None = None
+        self._backlog: list[Job] = []  # enqueued before start()
+        self._retrying = 0
+        self._latencies: deque[float] = deque(maxlen=1000)
+        self._counts = {"enqueued": 0, "processed": 0, "retried": 0, "failed": 0}
+
+    def register(self, kind: str, fn: Callable[[list[dict]], None], batch_size: int = 1) -> None:
+        """`fn` receives a list of up to `batch_size` payloads and runs in a worker thread."""
+        self._handlers[kind] = _Handler(fn=fn, batch_size=batch_size)
+
+    # ── Lifecycle ────────────────────────────────────────────────────────────
+
+    async def start(self) -> None:
+        s = get_settings()
+        self._loop = asyncio.get_running_loop()
+        if s.job_queue_db:
+            self._store = _Store(s.job_queue_db)
+        for kind, h in self._handlers.items():
+            h.queue = asyncio.Queue()
+            h.task = asyncio.create_task(self._worker(kind, h))
+        if self._store:
+            for job in self._store.pending():
+                self._put(job)
+        backlog, self._backlog = self._backlog, []
+        for job in backlog:
+            self._persist_and_put(job)
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Gives in-flight jobs `timeout` seconds to drain; persisted jobs resume on next start."""
+        queues = [h.queue.join() for h in self._handlers.values() if h.queue]
+        try:
+            await asyncio.wait_for(asyncio.gather(*queues), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for h in self._handlers.values():
+            if h.task:
+                h.task.cancel()
+        if self._store:
+            self._store.close()
+            self._store = None
+        self._loop = None
+
+    # ── Enqueue ──────────────────────────────────────────────────────────────
+
+    def enqueue(self, kind: str, payload: dict) -> None:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job = Job(kind=kind, payload=payload)
+        self._counts["enqueued"] += 1
+        if self._loop is None:
+            self._backlog.append(job)
+            return
+        self._persist_and_put(job)
+
+    def _persist_and_put(self, job: Job) -> None:
+        if self._store:
+            job.id = self._store.add(job)
+        self._put(job)
+
+    def _put(self, job: Job) -> None:
+        queue = self._handlers[job.kind].queue
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            queue.put_nowait(job)
+        else:
+            self._loop.call_soon_threadsafe(queue.put_nowait, job)
+
+    # ── Workers ──────────────────────────────────────────────────────────────
+
+    async def _worker(self, kind: str, h: _Handler) -> None:
+        while True:
+            batch = [await h.queue.get()]
+            while len(batch) < h.batch_size and not h.queue.empty():
+                batch.append(h.queue.get_nowait())
+            try:
+                await asyncio.to_thread(h.fn, [job.payload for job in batch])
+            except Exception:
+                for job in batch:
+                    self._schedule_retry(job)
+            else:
+                now = time.time()
+                self._counts["processed"] += len(batch)
+                self._latencies.extend(now - job.enqueued_at for job in batch)
+                if self._store:
+                    self._store.done([job.id for job in batch if job.id is not None])
+            finally:
+                for _ in batch:
+                    h.queue.task_done()
+
+    def _schedule_retry(self, job: Job) -> None:
+        s = get_settings()
+        job.attempts += 1
+        if job.attempts >= s.job_max_attempts:
+            self._counts["failed"] += 1
+            if self._store and job.id is not None:
+                self._store.fail(job)
+            return
+        self._counts["retried"] += 1
+        if self._store and job.id is not None:
+            self._store.retry(job)
+        delay = s.job_retry_base_delay * 2 ** (job.attempts - 1)
+        self._retrying += 1
+        self._loop.call_later(delay, self._requeue, job)
+
+    def _requeue(self, job: Job) -> None:
+        self._retrying -= 1
+        if self._loop is not None:
+            self._handlers[job.kind].queue.put_nowait(job)
+
+    # ── Metrics ──────────────────────────────────────────────────────────────
+
+    def metrics(self) -> dict:
+        depth = {kind: (h.queue.qsize() if h.queue else 0) for kind, h in self._handlers.items()}
+        lat = sorted(self._latencies)
+        return {
+            **self._counts,
+            "depth": depth,
+            "backlog": len(self._backlog),
+            "retrying": self._retrying,
+            "latency_ms": {
+                "p50": round(lat[len(lat) // 2] * 1000, 1) if lat else None,
+                "p95": round(lat[int(len(lat) * 0.95)] * 1000, 1) if lat else None,
+                "max": round(lat[-1] * 1000, 1) if lat else None,
+            },
+        }
+
+
+queue = JobQueue()
@@ -1,15 +1,41 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import time
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from config import get_settings
-from routers import products, auth, cart, orders, reviews
+from dependencies import require_admin
+from routers import products, auth, cart, orders, reviews, admin, batch
+from jobs import queue
+from reservations import reservations
+from profiler import profiler
+from capture import recorder, build_record
+import warmup
 import os
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await queue.start()
+    warmup.start(app)
+    reservations.start()
+    profiler.start()
+    recorder.start()
+    yield
+    recorder.stop()
+    profiler.stop()
+    await reservations.stop()
+    await queue.stop()
+    await warmup.stop()
+
+
 app = FastAPI(
     title="Save Sage Spices API",
     description="Backend API for the Save Sage Spices e-commerce platform",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # ── CORS ──────────────────────────────────────────────────────────────────────
@@ -27,12 +53,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ── Profiling ─────────────────────────────────────────────────────────────────
+# Registered only when enabled: each BaseHTTPMiddleware layer costs every request.
+if settings.profiler_enabled:
+    @app.middleware("http")
+    async def profile_requests(request: Request, call_next):
+        start = time.monotonic()
+        response = await call_next(request)
+        profiler.record(request.method, request.url.path, response.status_code, start, time.monotonic(),
+                        request.scope.get("endpoint"))
+        return response
+
+
+# ── Traffic capture ───────────────────────────────────────────────────────────
+if settings.capture_path:
+    @app.middleware("http")
+    async def capture_traffic(request: Request, call_next):
+        if not recorder.wants(request.url.path, request.headers):
+            return await call_next(request)
+        body = await request.body()
+        recorder.begin()
+        started_at, start = time.time(), time.monotonic()
+        response = await call_next(request)
+        recorder.write(build_record(request, body, response.status_code, start, time.monotonic(), started_at))
+        return response
+
+
 # ── Routers ───────────────────────────────────────────────────────────────────
 app.include_router(products.router, prefix="/products", tags=["Products"])
 app.include_router(auth.router,     prefix="/auth",     tags=["Auth"])
 app.include_router(cart.router,     prefix="/cart",     tags=["Cart"])
 app.include_router(orders.router,   prefix="/orders",   tags=["Orders"])
 app.include_router(reviews.router,  prefix="/reviews",  tags=["Reviews"])
+app.include_router(batch.router,    prefix="/batch",    tags=["Batch"])
+app.include_router(admin.router,    prefix="/admin",    tags=["Admin"],
+                   dependencies=[Depends(require_admin)])
 
 
 @app.get("/", tags=["Health"])
@@ -42,4 +97,14 @@ async def root():
 
 @app.get("/health", tags=["Health"])
 async def health():
-    return {"status": "healthy"}
+    return {"status": "healthy", "jobs": queue.metrics()}
+
+
+@app.get("/ready", tags=["Health"])
+async def ready():
+    """Readiness probe: 503 until warm-up has finished and Supabase answers."""
+    if not warmup.state.done:
+        return JSONResponse(status_code=503, content={"status": "warming_up", "error": warmup.state.error})
+    if not await warmup.upstream_reachable():
+        return JSONResponse(status_code=503, content={"status": "upstream_unreachable"})
+    return {"status": "ready"}
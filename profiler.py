@@ -0,0 +1,248 @@
+"""
+profiler.py — Opt-in statistical profiler and event-loop stall detector.
+Enabled with PROFILER_ENABLED=true. A sampler thread records the Python
+stack of every busy thread every PROFILER_INTERVAL_MS, with its thread id,
+into a short rolling window. When a request finishes, its window is kept as
+a profile if it was randomly sampled or slower than PROFILER_SLOW_MS.
+Worker-thread samples are kept only where they run the request's own (sync)
+handler; event-loop samples are kept under a shared root frame, since every
+concurrent request interleaves on that thread. The last PROFILER_KEEP
+profiles can be exported as collapsed stacks or speedscope JSON.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# A thread whose innermost frame is in one of these files is parked, not working.
+_IDLE_FILES = {"threading.py", "selectors.py", "queue.py", "thread.py"}
+# Root frame for event-loop samples, which concurrent requests share.
+SHARED_LOOP_FRAME = "(event loop, shared)"
+
+
+class Sampler(threading.Thread):
+    def __init__(self, interval: float, window: float):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.interval = interval
+        self.window = window
+        self.samples: deque[tuple[float, int, tuple[str, ...]]] = deque()
+        self.ignore: set[int] = set()
+        self.loop_thread: int | None = None
+        self._labels: dict = {}
+        self._stop_event = threading.Event()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _stack(self, frame) -> tuple[str, ...] | None:
+        if os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+            return None
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def run(self) -> None:
+        self.ignore.add(threading.get_ident())
+        while not self._stop_event.wait(self.interval):
+            now = time.monotonic()
+            for tid, frame in sys._current_frames().items():
+                if tid in self.ignore:
+                    continue
+                stack = self._stack(frame)
+                if stack:
+                    self.samples.append((now, tid, stack))
+            horizon = now - self.window
+            while self.samples and self.samples[0][0] < horizon:
+                self.samples.popleft()
+
+    def between(self, start: float, end: float, handler=None) -> Counter:
+        """
+        Stacks sampled during [start, end] that can belong to one request:
+        worker-thread stacks running `handler`, and event-loop stacks under
+        SHARED_LOOP_FRAME. Other worker threads serve other requests.
+        """
+        code = getattr(handler, "__code__", None)
+        label = self._label(code) if code else None
+        stacks = Counter()
+        for t, tid, stack in list(self.samples):
+            if not start <= t <= end:
+                continue
+            if tid == self.loop_thread:
+                stacks[(SHARED_LOOP_FRAME,) + stack] += 1
+            elif label and label in stack:
+                stacks[stack] += 1
+        return stacks
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+class LoopWatchdog(threading.Thread):
+    """Logs the event-loop thread's stack when it misses a heartbeat by `threshold` seconds."""
+
+    def __init__(self, threshold: float):
+        super().__init__(name="profiler-loop-watchdog", daemon=True)
+        self.threshold = threshold
+        self.beat = time.monotonic()
+        self.loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._stop_event = threading.Event()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self.beat = time.monotonic()
+            await asyncio.sleep(self.threshold / 4)
+
+    def start_heartbeat(self) -> None:
+        self.loop_thread = threading.get_ident()
+        self._task = asyncio.create_task(self._heartbeat())
+
+    def run(self) -> None:
+        reported = None
+        while not self._stop_event.wait(self.threshold / 4):
+            lag = time.monotonic() - self.beat
+            if lag < self.threshold:
+                reported = None
+                continue
+            if reported == self.beat:
+                continue  # already logged this stall
+            reported = self.beat
+            frame = sys._current_frames().get(self.loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<no frame>"
+            logger.warning("Event loop blocked for %.0f ms:\n%s", lag * 1000, stack)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._task:
+            self._task.cancel()
+
+
+class Profiler:
+    def __init__(self):
+        self.profiles: deque[dict] = deque()
+        self._ids = itertools.count(1)
+        self._sampler: Sampler | None = None
+        self._watchdog: LoopWatchdog | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._sampler is not None
+
+    # ── Lifecycle ────────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        s = get_settings()
+        if not s.profiler_enabled:
+            return
+        self.profiles = deque(maxlen=s.profiler_keep)
+        # The window must cover the slowest request we still want to capture
+        window = max(30.0, s.profiler_slow_ms / 1000 * 4)
+        self._sampler = Sampler(s.profiler_interval_ms / 1000, window)
+        self._sampler.loop_thread = threading.get_ident()  # start() runs on the loop
+        if s.loop_block_ms > 0:
+            self._watchdog = LoopWatchdog(s.loop_block_ms / 1000)
+            self._watchdog.start_heartbeat()
+            self._watchdog.start()
+            self._sampler.ignore.add(self._watchdog.ident)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        if self._sampler:
+            self._sampler.stop()
+            self._sampler = None
+        if self._watchdog:
+            self._watchdog.stop()
+            self._watchdog = None
+
+    # ── Capture ──────────────────────────────────────────────────────────────
+
+    def record(self, method: str, path: str, status: int, start: float, end: float,
+               handler=None) -> None:
+        """Keeps the request's samples from [start, end] if the request qualifies."""
+        if not self._sampler:
+            return
+        s = get_settings()
+        duration_ms = (end - start) * 1000
+        if duration_ms >= s.profiler_slow_ms:
+            reason = "slow"
+        elif random.random() < s.profiler_sample_rate:
+            reason = "sampled"
+        else:
+            return
+        self.profiles.append({
+            "id": next(self._ids),
+            "method": method,
+            "path": path,
+            "status": status,
+            "reason": reason,
+            "duration_ms": round(duration_ms, 1),
+            "captured_at": time.time(),
+            "interval_ms": s.profiler_interval_ms,
+            "stacks": self._sampler.between(start, end, handler),
+        })
+
+    def get(self, profile_id: int) -> dict | None:
+        return next((p for p in self.profiles if p["id"] == profile_id), None)
+
+    def summaries(self) -> list[dict]:
+        return [
+            {k: v for k, v in p.items() if k != "stacks"} | {"samples": sum(p["stacks"].values())}
+            for p in reversed(self.profiles)
+        ]
+
+
+# ── Export formats ───────────────────────────────────────────────────────────
+
+def to_collapsed(profile: dict) -> str:
+    """Brendan Gregg's folded format, readable by flamegraph.pl and speedscope."""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in profile["stacks"].items())
+
+
+def to_speedscope(profile: dict) -> dict:
+    frames: list[dict] = []
+    index: dict[str, int] = {}
+    samples, weights = [], []
+    for stack, count in profile["stacks"].items():
+        ids = []
+        for name in stack:
+            if name not in index:
+                index[name] = len(frames)
+                frames.append({"name": name})
+            ids.append(index[name])
+        samples.append(ids)
+        weights.append(count * profile["interval_ms"])
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": f"{profile['method']} {profile['path']} ({profile['duration_ms']} ms)",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": f"profile-{profile['id']}",
+        "exporter": "save-sage-api",
+    }
+
+
+profiler = Profiler()
@@ -0,0 +1,113 @@
+"""
+recommendations.py — "Frequently bought together" from order_items.
+A sparse co-occurrence matrix (dict of dicts) counts how often two
+products share an order. Each product's top-k neighbours are kept
+precomputed, so lookups are a dict read. New orders update only the rows
+of the products they contain.
+"""
+
+import heapq
+import threading
+from datetime import datetime, timedelta, timezone
+from config import get_db, get_settings
+
+# Orders this close to the build's start may also arrive through add_order
+_OVERLAP = timedelta(minutes=5)
+
+
+class CoOccurrenceIndex:
+    def __init__(self):
+        self._pairs: dict[str, dict[str, int]] = {}
+        self._top: dict[str, list[tuple[str, int]]] = {}
+        self._lock = threading.Lock()
+        self._building = False
+        self._pending: list[dict] = []  # items seen while a build is running
+
+    # ── Updates ──────────────────────────────────────────────────────────────
+
+    def _add_products(self, pairs: dict, product_ids: set[str]) -> None:
+        for a in product_ids:
+            row = pairs.setdefault(a, {})
+            for b in product_ids:
+                if b != a:
+                    row[b] = row.get(b, 0) + 1
+
+    def _rank(self, product_ids) -> None:
+        k = get_settings().recommendations_top_k
+        for pid in product_ids:
+            row = self._pairs.get(pid, {})
+            self._top[pid] = heapq.nlargest(k, row.items(), key=lambda kv: (kv[1], kv[0]))
+
+    def add_order(self, items: list[dict]) -> None:
+        """Folds in freshly inserted order_items rows (all from one order)."""
+        with self._lock:
+            if self._building:
+                self._pending.extend(items)
+                return
+            self._apply(items)
+
+    def _apply(self, items: list[dict], counted_orders: set | None = None) -> None:
+        by_order: dict[str, set[str]] = {}
+        for item in items:
+            if counted_orders and item["order_id"] in counted_orders:
+                continue  # already counted by the build
+            by_order.setdefault(item["order_id"], set()).add(item["product_id"])
+        for product_ids in by_order.values():
+            if len(product_ids) > 1:
+                self._add_products(self._pairs, product_ids)
+                self._rank(product_ids)
+
+    # ── Build ────────────────────────────────────────────────────────────────
+
+    def build(self) -> None:
+        """
+        Rebuilds the matrix from the full order history, paging through
+        `orders` on (created_at, id) with their items embedded, then swaps
+        it in. Orders placed during the build are queued by add_order and
+        applied afterwards unless the scan already saw them.
+        """
+        with self._lock:
+            self._building = True
+            self._pending = []
+        try:
+            pairs: dict[str, dict[str, int]] = {}
+            recent: set = set()
+            cutoff = datetime.now(timezone.utc) - _OVERLAP
+            pages = get_db().iter_pages("orders", columns="id,created_at,order_items(product_id)",
+                                        key=("created_at", "id"),
+                                        batch_size=get_settings().analytics_batch_size)
+            for page in pages:
+                for order in page:
+                    product_ids = {i["product_id"] for i in order.get("order_items") or []}
+                    if len(product_ids) > 1:
+                        self._add_products(pairs, product_ids)
+                    # Items land in one bulk insert after the order row, so an
+                    # order read with none yet must still take its queued update
+                    if not product_ids:
+                        continue
+                    created = datetime.fromisoformat(order["created_at"])
+                    if (created.tzinfo and created or created.replace(tzinfo=timezone.utc)) >= cutoff:
+                        recent.add(order["id"])
+        except Exception:
+            with self._lock:
+                self._building = False
+                self._apply(self._pending)
+                self._pending = []
+            raise
+
+        with self._lock:
+            self._pairs = pairs
+            self._top = {}
+            self._rank(pairs.keys())
+            self._building = False
+            self._apply(self._pending, counted_orders=recent)
+            self._pending = []
+
+    # ── Reads ────────────────────────────────────────────────────────────────
+
+    def related(self, product_id: str, limit: int | None = None) -> list[tuple[str, int]]:
+        top = self._top.get(product_id, [])
+        return top[:limit] if limit else top
+
+
+recommender = CoOccurrenceIndex()
@@ -0,0 +1,247 @@
+"""
+replay.py — Re-drives captured traffic against the app for perf comparisons.
+Reads a capture file written by capture.py and sends every record to the
+FastAPI app in-process, at the original pace or N× faster. Supabase is
+replaced by a mock that serves the recorded upstream responses (with their
+recorded latency unless --no-upstream-latency is given).
+
+Usage:
+    python replay.py run capture.jsonl --speed 4 --label candidate --out candidate.json
+    python replay.py compare baseline.json candidate.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+import httpx
+
+# Values substituted for fields capture.py masked, so request validation still passes
+PLACEHOLDERS = {
+    "email": "replay@example.com",
+    "password": "replay-password",
+    "refresh_token": "replay-refresh-token",
+    "phone": "0000000000",
+    "pincode": "000000",
+}
+
+
+def load_records(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(records, key=lambda r: r["ts"])
+
+
+def fill_redacted(value, key: str | None = None):
+    if isinstance(value, dict):
+        return {k: fill_redacted(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [fill_redacted(v, key) for v in value]
+    if value == "<redacted>":
+        return PLACEHOLDERS.get(key, "replay")
+    return value
+
+
+class RecordedUpstream:
+    """
+    Serves recorded PostgREST/GoTrue responses. Calls are matched on
+    method, path and query first, then on method and path alone; each
+    match is consumed in recorded order and the last one is reused.
+    Sync handlers call in from many threadpool workers at once, hence the lock.
+    """
+
+    def __init__(self, records: list[dict], latency: bool = True):
+        self.latency = latency
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._exact: dict[tuple, deque] = defaultdict(deque)
+        self._loose: dict[tuple, deque] = defaultdict(deque)
+        for record in records:
+            for call in record.get("upstream") or []:
+                self._exact[(call["method"], call["path"], call["query"])].append(call)
+                self._loose[(call["method"], call["path"])].append(call)
+
+    def _pick(self, request: httpx.Request) -> dict | None:
+        path = request.url.path
+        with self._lock:
+            for calls in (self._exact.get((request.method, path, str(request.url.params))),
+                          self._loose.get((request.method, path))):
+                if calls:
+                    return calls.popleft() if len(calls) > 1 else calls[0]
+        return None
+
+    def _response(self, call: dict | None) -> httpx.Response:
+        if call is None:
+            with self._lock:
+                self.misses += 1
+            return httpx.Response(503, json={"message": "No recorded upstream response"})
+        if call["body"] is None:
+            return httpx.Response(call["status"])
+        return httpx.Response(call["status"], json=call["body"])
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        call = self._pick(request)
+        if call and self.latency:
+            time.sleep(call["elapsed_ms"] / 1000)
+        return self._response(call)
+
+    async def ahandle(self, request: httpx.Request) -> httpx.Response:
+        call = self._pick(request)
+        if call and self.latency:
+            await asyncio.sleep(call["elapsed_ms"] / 1000)
+        return self._response(call)
+
+
+def _load_app(upstream: RecordedUpstream):
+    for key in ("SUPABASE_URL", "SUPABASE_ANON_KEY", "SUPABASE_SERVICE_KEY", "SUPABASE_JWT_SECRET"):
+        os.environ.setdefault(key, "http://replay.invalid" if key == "SUPABASE_URL" else "replay")
+    os.environ["CAPTURE_PATH"] = ""  # never record the replay itself
+    import config
+    config.use_upstream_transports(httpx.MockTransport(upstream.handle),
+                                   httpx.MockTransport(upstream.ahandle))
+    import main
+    return main.app
+
+
+async def replay(records: list[dict], speed: float, concurrency: int, latency: bool) -> dict:
+    upstream = RecordedUpstream(records, latency=latency)
+    app = _load_app(upstream)
+    gate = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    first_ts = records[0]["ts"]
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+        started = time.monotonic()
+
+        async def send(record: dict) -> dict:
+            if speed > 0:
+                delay = (record["ts"] - first_ts) / speed - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            headers = {"Authorization": f"Bearer replay-{record['auth']}"} if record.get("auth") else {}
+            body = fill_redacted(record["body"]) if record.get("body") is not None else None
+            async with gate:
+                sent = time.monotonic()
+                res = await client.request(record["method"], record["path"], params=record.get("query") or None,
+                                           json=body, headers=headers)
+                latency_ms = (time.monotonic() - sent) * 1000
+            return {"route": f"{record['method']} {record['route']}", "latency_ms": latency_ms,
+                    "status": res.status_code, "expected_status": record["status"]}
+
+        results = await asyncio.gather(*(send(r) for r in records))
+        wall = time.monotonic() - started
+
+    return {"results": results, "wall_s": wall, "upstream_misses": upstream.misses}
+
+
+# ── Reporting ────────────────────────────────────────────────────────────────
+
+def _pct(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return round(values[min(len(values) - 1, int(q * len(values)))], 2)
+
+
+def _stats(latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "p50_ms": _pct(latencies, 0.50),
+        "p95_ms": _pct(latencies, 0.95),
+        "p99_ms": _pct(latencies, 0.99),
+    }
+
+
+def summarize(label: str, speed: float, run: dict) -> dict:
+    results = run["results"]
+    by_route: dict[str, list[float]] = defaultdict(list)
+    for r in results:
+        by_route[r["route"]].append(r["latency_ms"])
+    return {
+        "label": label,
+        "speed": speed,
+        "requests": len(results),
+        "errors": sum(1 for r in results if r["status"] >= 500),
+        "status_mismatches": sum(1 for r in results if r["status"] != r["expected_status"]),
+        "upstream_misses": run["upstream_misses"],
+        "wall_s": round(run["wall_s"], 3),
+        "throughput_rps": round(len(results) / run["wall_s"], 2) if run["wall_s"] else 0.0,
+        "overall": _stats([r["latency_ms"] for r in results]),
+        "routes": {route: _stats(lat) for route, lat in sorted(by_route.items())},
+    }
+
+
+def _delta(a: float, b: float) -> str:
+    if not a:
+        return "n/a"
+    return f"{(b - a) / a * 100:+.1f}%"
+
+
+def compare(base: dict, cand: dict) -> str:
+    lines = [
+        f"{base['label']} -> {cand['label']}",
+        f"throughput  {base['throughput_rps']:>9} -> {cand['throughput_rps']:<9} rps  "
+        f"{_delta(base['throughput_rps'], cand['throughput_rps'])}",
+        f"errors      {base['errors']:>9} -> {cand['errors']}",
+        "",
+        f"{'route':<40} {'count':>6} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}",
+    ]
+    routes = {"(overall)": (base["overall"], cand["overall"])}
+    for route in sorted(base["routes"].keys() | cand["routes"].keys()):
+        routes[route] = (base["routes"].get(route), cand["routes"].get(route))
+    for route, (a, b) in routes.items():
+        if not a or not b:
+            lines.append(f"{route:<40} {'only in one run':>6}")
+            continue
+        cells = [f"{a[k]:>7}->{b[k]:<7}{_delta(a[k], b[k]):>4}" for k in ("p50_ms", "p95_ms", "p99_ms")]
+        lines.append(f"{route:<40} {b['count']:>6} " + " ".join(f"{c:>18}" for c in cells))
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="Replay a capture file and write a result summary")
+    run_p.add_argument("capture")
+    run_p.add_argument("--speed", type=float, default=1.0, help="Pace multiplier; 0 sends as fast as possible")
+    run_p.add_argument("--concurrency", type=int, default=50)
+    run_p.add_argument("--label", default="run")
+    run_p.add_argument("--out", help="Write the JSON summary here")
+    run_p.add_argument("--no-upstream-latency", action="store_true")
+
+    cmp_p = sub.add_parser("compare", help="Compare two result summaries")
+    cmp_p.add_argument("baseline")
+    cmp_p.add_argument("candidate")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        records = load_records(args.capture)
+        if not records:
+            print("Capture file is empty", file=sys.stderr)
+            return 1
+        run = asyncio.run(replay(records, args.speed, args.concurrency, not args.no_upstream_latency))
+        summary = summarize(args.label, args.speed, run)
+        text = json.dumps(summary, indent=2)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                f.write(text)
+        print(text)
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        cand = json.load(f)
+    print(compare(base, cand))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
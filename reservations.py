@@ -0,0 +1,154 @@
+"""
+reservations.py — Time-limited soft stock reservations.
+Adding to a cart holds units for RESERVATION_TTL seconds. Holds live in
+memory next to a per-product stock counter, and expire through a min-heap
+of deadlines checked on every call. The counters are reconciled with
+`products.stock_quantity` on a timer instead of locking rows in Postgres.
+Checkout (routers/orders.py) writes the sold units back to
+`products.stock_quantity`, so a reconcile never re-frees them.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass
+from config import get_db, get_settings
+
+
+@dataclass
+class Hold:
+    quantity: int
+    expires_at: float
+    seq: int
+
+
+class ReservationBook:
+    """
+    Holds are keyed by (cart_id, product_id) and store the cart line's
+    total quantity. Heap entries are never removed eagerly: an entry whose
+    seq no longer matches the live hold is simply skipped when popped.
+    """
+
+    def __init__(self):
+        self._holds: dict[tuple[str, str], Hold] = {}
+        self._by_cart: dict[str, set[str]] = {}
+        self._held: dict[str, int] = {}
+        self._stock: dict[str, int] = {}
+        self._heap: list[tuple[float, int, str, str]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+
+    # ── Internals (lock held) ────────────────────────────────────────────────
+
+    def _expire(self, now: float) -> None:
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, cart_id, product_id = heapq.heappop(self._heap)
+            hold = self._holds.get((cart_id, product_id))
+            if hold is not None and hold.seq == seq:
+                self._drop(cart_id, product_id)
+
+    def _drop(self, cart_id: str, product_id: str) -> Hold | None:
+        hold = self._holds.pop((cart_id, product_id), None)
+        if hold is not None:
+            products = self._by_cart[cart_id]
+            products.discard(product_id)
+            if not products:
+                del self._by_cart[cart_id]
+            self._held[product_id] -= hold.quantity
+            if not self._held[product_id]:
+                del self._held[product_id]
+        return hold
+
+    # ── Public API ───────────────────────────────────────────────────────────
+
+    def available(self, product_id: str) -> int | None:
+        """Unheld units, or None when the product's stock is not known yet."""
+        with self._lock:
+            self._expire(time.monotonic())
+            if product_id not in self._stock:
+                return None
+            return self._stock[product_id] - self._held.get(product_id, 0)
+
+    def hold(self, cart_id: str, product_id: str, quantity: int, stock: int | None = None) -> bool:
+        """
+        Sets the cart's hold on `product_id` to `quantity` units and restarts
+        its TTL. `stock` seeds the counter the first time a product is seen.
+        Returns False, leaving any existing hold untouched, if too few units are
+        free or `quantity` is not positive (a negative hold would free stock).
+        """
+        if quantity <= 0:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if product_id not in self._stock and stock is not None:
+                self._stock[product_id] = stock
+            current = self._holds.get((cart_id, product_id))
+            if product_id in self._stock:
+                free = self._stock[product_id] - self._held.get(product_id, 0)
+                if current:
+                    free += current.quantity
+                if quantity > free:
+                    return False
+            self._drop(cart_id, product_id)
+            seq = next(self._seq)
+            expires_at = now + get_settings().reservation_ttl
+            self._holds[(cart_id, product_id)] = Hold(quantity, expires_at, seq)
+            self._held[product_id] = self._held.get(product_id, 0) + quantity
+            self._by_cart.setdefault(cart_id, set()).add(product_id)
+            heapq.heappush(self._heap, (expires_at, seq, cart_id, product_id))
+            return True
+
+    def release(self, cart_id: str, product_id: str | None = None) -> None:
+        """Drops one hold, or every hold for the cart when `product_id` is None."""
+        with self._lock:
+            if product_id is not None:
+                self._drop(cart_id, product_id)
+                return
+            for pid in list(self._by_cart.get(cart_id, ())):
+                self._drop(cart_id, pid)
+
+    def commit(self, cart_id: str, stock: dict[str, int]) -> None:
+        """
+        Turns a cart's holds into sales: the holds are dropped and the stock
+        counters set to the values checkout wrote to the database. Setting
+        rather than subtracting stays right if a reconcile already read them.
+        """
+        with self._lock:
+            for pid in list(self._by_cart.get(cart_id, ())):
+                self._drop(cart_id, pid)
+            self._stock.update(stock)
+
+    def reconcile(self, rows: list[dict]) -> None:
+        """Replaces the stock counters with fresh `products` rows."""
+        with self._lock:
+            self._stock = {r["id"]: r.get("stock_quantity") or 0 for r in rows}
+            self._expire(time.monotonic())
+
+    # ── Background reconcile ─────────────────────────────────────────────────
+
+    async def _reconcile_loop(self) -> None:
+        interval = get_settings().reservation_reconcile_interval
+        while True:
+            try:
+                rows = await asyncio.to_thread(get_db().select, "products", columns="id,stock_quantity")
+                self.reconcile(rows or [])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass  # Keep the current counters until the next round
+            await asyncio.sleep(interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._reconcile_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+reservations = ReservationBook()
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+from typing import Literal
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from analytics import sales, iter_items, EXPORT_FIELDS
+from profiler import profiler, to_collapsed, to_speedscope
+
+router = APIRouter()
+
+
+@router.get("/analytics/sales")
+def sales_report(
+    group: Literal["product", "category", "day", "product_day"] = Query("product"),
+    since: str | None = Query(None, description="First day, YYYY-MM-DD"),
+    until: str | None = Query(None, description="Last day, YYYY-MM-DD"),
+    refresh: bool = Query(True),
+):
+    if refresh:
+        sales.refresh()
+    try:
+        rows = sales.report(group, since=since, until=until)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"group": group, "watermark": sales.watermark, "rows": rows, "count": len(rows)}
+
+
+@router.get("/analytics/export")
+def export_order_items(fmt: Literal["csv", "ndjson"] = Query("csv", alias="format")):
+    """Streams every order item page by page; the full history is never held in memory."""
+
+    def csv_lines():
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        for page in iter_items():
+            writer.writerows(page)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        yield buf.getvalue()
+
+    def ndjson_lines():
+        for page in iter_items():
+            yield "".join(json.dumps(row) + "\n" for row in page)
+
+    if fmt == "csv":
+        return StreamingResponse(csv_lines(), media_type="text/csv",
+                                 headers={"Content-Disposition": "attachment; filename=order_items.csv"})
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@router.get("/profiles")
+async def list_profiles():
+    return {"enabled": profiler.enabled, "profiles": profiler.summaries()}
+
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: int,
+                           fmt: Literal["speedscope", "collapsed"] = Query("speedscope", alias="format")):
+    """Speedscope JSON (https://www.speedscope.app) or folded stacks for flamegraph.pl."""
+    profile = profiler.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if fmt == "collapsed":
+        return PlainTextResponse(to_collapsed(profile), headers={
+            "Content-Disposition": f"attachment; filename=profile-{profile_id}.folded"})
+    return JSONResponse(to_speedscope(profile), headers={
+        "Content-Disposition": f"attachment; filename=profile-{profile_id}.speedscope.json"})
@@ -1,10 +1,22 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from config import get_db
+from dependencies import security, revoke_token
+from jobs import queue
 
 router = APIRouter()
 
 
+def _upsert_profiles(payloads: list[dict]) -> None:
+    # One upsert per batch; duplicate ids in a single upsert are rejected by Postgres
+    rows = list({p["id"]: p for p in payloads}.values())
+    get_db().upsert("profiles", rows)
+
+
+queue.register("profile_upsert", _upsert_profiles, batch_size=50)
+
+
 class SignUpRequest(BaseModel):
     email: EmailStr
     password: str
@@ -16,8 +28,31 @@ class SignInRequest(BaseModel):
     password: str
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+def _session_response(res: dict) -> dict:
+    access_token = res.get("access_token")
+    if not access_token:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    user = res.get("user", {})
+    return {
+        "access_token": access_token,
+        "refresh_token": res.get("refresh_token"),
+        "token_type": "bearer",
+        "expires_in": res.get("expires_in"),
+        "user": {
+            "id": user.get("id"),
+            "email": user.get("email"),
+            "full_name": (user.get("user_metadata") or {}).get("full_name", ""),
+        },
+    }
+
+
 @router.post("/signup", status_code=status.HTTP_201_CREATED)
-async def signup(body: SignUpRequest):
+def signup(body: SignUpRequest):
     db = get_db()
     try:
         res = db.auth_signup(
@@ -32,11 +67,8 @@ async def signup(body: SignUpRequest):
     if not user_id:
         raise HTTPException(status_code=400, detail=res.get("msg", "Signup failed"))
 
-    # Create profile row
-    try:
-        db.upsert("profiles", {"id": user_id, "full_name": body.full_name or ""})
-    except Exception:
-        pass  # Non-fatal — profile can be created later
+    # Create profile row off the request path (retried by the job queue)
+    queue.enqueue("profile_upsert", {"id": user_id, "full_name": body.full_name or ""})
 
     return {
         "message": "User created. Check your email to confirm your account.",
@@ -46,31 +78,32 @@ async def signup(body: SignUpRequest):
 
 
 @router.post("/login")
-async def login(body: SignInRequest):
+def login(body: SignInRequest):
     db = get_db()
     try:
         res = db.auth_login(body.email, body.password)
     except Exception as e:
         raise HTTPException(status_code=401, detail=str(e))
+    return _session_response(res)
 
-    access_token = res.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    user = res.get("user", {})
-    return {
-        "access_token": access_token,
-        "refresh_token": res.get("refresh_token"),
-        "token_type": "bearer",
-        "expires_in": res.get("expires_in"),
-        "user": {
-            "id": user.get("id"),
-            "email": user.get("email"),
-            "full_name": (user.get("user_metadata") or {}).get("full_name", ""),
-        },
-    }
+@router.post("/refresh")
+def refresh(body: RefreshRequest):
+    """Exchanges a refresh token for a new session without a password grant."""
+    db = get_db()
+    try:
+        res = db.auth_refresh(body.refresh_token)
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    return _session_response(res)
 
 
 @router.post("/logout")
-async def logout():
+def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    token = credentials.credentials
+    revoke_token(token)
+    try:
+        get_db().auth_logout(token)
+    except Exception:
+        pass  # Already expired or revoked upstream — nothing left to end
     return {"message": "Logged out successfully"}
@@ -0,0 +1,99 @@
+import asyncio
+import posixpath
+import re
+import httpx
+from urllib.parse import unquote
+from typing import Any, Literal
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from pydantic import BaseModel
+from capture import INTERNAL_HEADER
+from config import get_settings
+from dependencies import get_current_user
+
+router = APIRouter()
+
+# Streams never finish and nested batches would multiply fan-out.
+_BLOCKED_PREFIXES = ("/batch", "/products/stream", "/admin")
+
+
+class SubRequest(BaseModel):
+    method: Literal["GET", "POST", "PATCH", "DELETE"] = "GET"
+    path: str
+    query: dict[str, str] | None = None
+    body: Any = None
+
+
+class BatchRequest(BaseModel):
+    requests: list[SubRequest]
+
+
+def _normalize(path: str) -> str | None:
+    """
+    Decodes and normalises a sub-request path the way routing will see it,
+    so the blocklist is checked against the path that is actually dispatched.
+    Returns None for paths that cannot be batched safely.
+    """
+    decoded = unquote(path)
+    # Anything still encoded would be decoded again before routing
+    if not decoded.startswith("/") or any(c in decoded for c in "?#%\\"):
+        return None
+    normalized = posixpath.normpath(re.sub(r"/{2,}", "/", decoded))
+    if path.endswith("/") and normalized != "/":
+        normalized += "/"
+    if normalized.startswith(_BLOCKED_PREFIXES):
+        return None
+    return normalized
+
+
+async def _dispatch(client: httpx.AsyncClient, sub: SubRequest, path: str, headers: dict) -> dict:
+    res = await client.request(
+        sub.method,
+        path,
+        params=sub.query,
+        json=sub.body if sub.method != "GET" else None,
+        headers=headers,
+    )
+    if res.headers.get("content-type", "").startswith("application/json"):
+        body = res.json()
+    else:
+        body = res.text
+    return {"path": sub.path, "status": res.status_code, "body": body}
+
+
+@router.post("")
+async def batch(
+    body: BatchRequest,
+    request: Request,
+    credentials: HTTPAuthorizationCredentials | None = Depends(HTTPBearer(auto_error=False)),
+):
+    """
+    Runs several API calls in one round trip.
+    Sub-requests go through the app in-process and run concurrently; the
+    bearer token is validated once here and reused from the token cache.
+    """
+    if request.headers.get(INTERNAL_HEADER) == "batch":
+        raise HTTPException(status_code=422, detail="Batches cannot be nested")
+    if len(body.requests) > get_settings().batch_max_requests:
+        raise HTTPException(status_code=422, detail="Too many sub-requests in one batch")
+    paths = [_normalize(sub.path) for sub in body.requests]
+    for sub, path in zip(body.requests, paths):
+        if path is None:
+            raise HTTPException(status_code=422, detail=f"Path '{sub.path}' cannot be batched")
+
+    headers = {INTERNAL_HEADER: "batch"}
+    if credentials:
+        await get_current_user(credentials)
+        headers["Authorization"] = f"Bearer {credentials.credentials}"
+
+    transport = httpx.ASGITransport(app=request.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://batch") as client:
+        try:
+            responses = await asyncio.wait_for(
+                asyncio.gather(*(_dispatch(client, sub, path, headers)
+                                 for sub, path in zip(body.requests, paths))),
+                get_settings().batch_timeout,
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Batch timed out")
+    return {"responses": responses}
@@ -1,14 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from config import get_db
 from dependencies import get_current_user
+from reservations import reservations
 
 router = APIRouter()
 
 
 class AddItemRequest(BaseModel):
     product_id: str
-    quantity: int = 1
+    quantity: int = Field(1, gt=0)
 
 
 class UpdateQuantityRequest(BaseModel):
@@ -24,6 +25,18 @@ def _get_or_create_cart(user_id: str) -> str:
     return new_cart[0]["id"]
 
 
+def _hold_or_409(cart_id: str, product_id: str, quantity: int, stock: int | None = None) -> None:
+    if not reservations.hold(cart_id, product_id, quantity, stock=stock):
+        left = max(reservations.available(product_id) or 0, 0)
+        raise HTTPException(status_code=409, detail=f"Only {left} left in stock")
+
+
+def _cart_item_product(cart_id: str, item_id: str) -> str | None:
+    rows = get_db().select("cart_items", columns="product_id",
+                           filters={"id": f"eq.{item_id}", "cart_id": f"eq.{cart_id}"})
+    return rows[0]["product_id"] if rows else None
+
+
 def _build_cart_response(cart_id: str) -> dict:
     db = get_db()
     items = db.select(
@@ -40,13 +53,13 @@ def _build_cart_response(cart_id: str) -> dict:
 
 
 @router.get("")
-async def get_cart(user: dict = Depends(get_current_user)):
+def get_cart(user: dict = Depends(get_current_user)):
     cart_id = _get_or_create_cart(user["id"])
     return _build_cart_response(cart_id)
 
 
 @router.post("/items", status_code=status.HTTP_201_CREATED)
-async def add_item(body: AddItemRequest, user: dict = Depends(get_current_user)):
+def add_item(body: AddItemRequest, user: dict = Depends(get_current_user)):
     db = get_db()
     cart_id = _get_or_create_cart(user["id"])
 
@@ -56,6 +69,9 @@ async def add_item(body: AddItemRequest, user: dict = Depends(get_current_user))
 
     existing = db.select("cart_items", columns="id,quantity",
                          filters={"cart_id": f"eq.{cart_id}", "product_id": f"eq.{body.product_id}"})
+    quantity = body.quantity + (existing[0]["quantity"] if existing else 0)
+    _hold_or_409(cart_id, body.product_id, quantity, stock=prod[0]["stock_quantity"])
+
     if existing:
         item = existing[0]
         db.update("cart_items", {"quantity": item["quantity"] + body.quantity},
@@ -67,27 +83,36 @@ async def add_item(body: AddItemRequest, user: dict = Depends(get_current_user))
 
 
 @router.patch("/items/{item_id}")
-async def update_item(item_id: str, body: UpdateQuantityRequest, user: dict = Depends(get_current_user)):
+def update_item(item_id: str, body: UpdateQuantityRequest, user: dict = Depends(get_current_user)):
     db = get_db()
     cart_id = _get_or_create_cart(user["id"])
+    product_id = _cart_item_product(cart_id, item_id)
     if body.quantity <= 0:
         db.delete("cart_items", {"id": f"eq.{item_id}", "cart_id": f"eq.{cart_id}"})
+        if product_id:
+            reservations.release(cart_id, product_id)
     else:
+        if product_id:
+            _hold_or_409(cart_id, product_id, body.quantity)
         db.update("cart_items", {"quantity": body.quantity}, {"id": f"eq.{item_id}", "cart_id": f"eq.{cart_id}"})
     return _build_cart_response(cart_id)
 
 
 @router.delete("/items/{item_id}")
-async def remove_item(item_id: str, user: dict = Depends(get_current_user)):
+def remove_item(item_id: str, user: dict = Depends(get_current_user)):
     db = get_db()
     cart_id = _get_or_create_cart(user["id"])
+    product_id = _cart_item_product(cart_id, item_id)
     db.delete("cart_items", {"id": f"eq.{item_id}", "cart_id": f"eq.{cart_id}"})
+    if product_id:
+        reservations.release(cart_id, product_id)
     return _build_cart_response(cart_id)
 
 
 @router.delete("")
-async def clear_cart(user: dict = Depends(get_current_user)):
+def clear_cart(user: dict = Depends(get_current_user)):
     db = get_db()
     cart_id = _get_or_create_cart(user["id"])
     db.delete("cart_items", {"cart_id": f"eq.{cart_id}"})
+    reservations.release(cart_id)
     return {"message": "Cart cleared", "cart_id": cart_id, "items": [], "total": 0, "item_count": 0}
@@ -2,9 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from config import get_db
 from dependencies import get_current_user
+from recommendations import recommender
+from reservations import reservations
 
 router = APIRouter()
 
+_STOCK_RETRIES = 5
+
 
 class ShippingAddress(BaseModel):
     full_name: str
@@ -20,8 +24,32 @@ class CreateOrderRequest(BaseModel):
     shipping_address: ShippingAddress
 
 
+def _adjust_stock(product_id: str, delta: int, current: int | None = None) -> int | None:
+    """
+    Adds `delta` to products.stock_quantity with a compare-and-set PATCH
+    (filtered on the value just read), retrying when another checkout wins
+    the race. Returns the value written, or None if a decrement would take
+    stock below zero.
+    """
+    db = get_db()
+    for _ in range(_STOCK_RETRIES):
+        if current is None:
+            rows = db.select("products", columns="stock_quantity", filters={"id": f"eq.{product_id}"})
+            if not rows:
+                return None
+            current = rows[0]["stock_quantity"] or 0
+        if current + delta < 0:
+            return None
+        updated = db.update("products", {"stock_quantity": current + delta},
+                            {"id": f"eq.{product_id}", "stock_quantity": f"eq.{current}"})
+        if updated:
+            return current + delta
+        current = None
+    return None
+
+
 @router.post("", status_code=status.HTTP_201_CREATED)
-async def create_order(body: CreateOrderRequest, user: dict = Depends(get_current_user)):
+def create_order(body: CreateOrderRequest, user: dict = Depends(get_current_user)):
     db = get_db()
 
     cart = db.select("carts", columns="id", filters={"user_id": f"eq.{user['id']}"})
@@ -38,27 +66,55 @@ async def create_order(body: CreateOrderRequest, user: dict = Depends(get_curren
     if not items:
         raise HTTPException(status_code=400, detail="Cannot create order from an empty cart")
 
+    if any(item["quantity"] <= 0 for item in items):
+        raise HTTPException(status_code=400, detail="Cart has items with an invalid quantity")
+
+    # Re-take holds that may have expired since the items were added
+    for item in items:
+        if not reservations.hold(cart_id, item["product_id"], item["quantity"],
+                                 stock=item["products"]["stock_quantity"]):
+            name = item["products"].get("name") or item["product_id"]
+            raise HTTPException(status_code=409, detail=f"'{name}' no longer has enough stock")
+
     total = sum(item["quantity"] * item["products"]["price"] for item in items)
 
-    order = db.insert("orders", {
-        "user_id": user["id"],
-        "total_amount": round(total, 2),
-        "shipping_address": body.shipping_address.model_dump(),
-        "status": "pending",
-    })
-    order_id = order[0]["id"]
-
-    db.insert("order_items", [
-        {
-            "order_id": order_id,
-            "product_id": item["product_id"],
-            "quantity": item["quantity"],
-            "unit_price": item["products"]["price"],
-        }
-        for item in items
-    ])
+    # Take the units out of products.stock_quantity; undo on any failure
+    taken: list[dict] = []
+    stock: dict[str, int] = {}
+    try:
+        for item in items:
+            left = _adjust_stock(item["product_id"], -item["quantity"], item["products"]["stock_quantity"])
+            if left is None:
+                name = item["products"].get("name") or item["product_id"]
+                raise HTTPException(status_code=409, detail=f"'{name}' no longer has enough stock")
+            taken.append(item)
+            stock[item["product_id"]] = left
+
+        order = db.insert("orders", {
+            "user_id": user["id"],
+            "total_amount": round(total, 2),
+            "shipping_address": body.shipping_address.model_dump(),
+            "status": "pending",
+        })
+        order_id = order[0]["id"]
+
+        order_items = db.insert("order_items", [
+            {
+                "order_id": order_id,
+                "product_id": item["product_id"],
+                "quantity": item["quantity"],
+                "unit_price": item["products"]["price"],
+            }
+            for item in items
+        ])
+    except Exception:
+        for item in taken:
+            _adjust_stock(item["product_id"], item["quantity"])
+        raise
+    recommender.add_order(order_items)
 
     db.delete("cart_items", {"cart_id": f"eq.{cart_id}"})
+    reservations.commit(cart_id, stock)
 
     return {
         "message": "Order placed successfully",
@@ -69,7 +125,7 @@ async def create_order(body: CreateOrderRequest, user: dict = Depends(get_curren
 
 
 @router.get("")
-async def list_orders(user: dict = Depends(get_current_user)):
+def list_orders(user: dict = Depends(get_current_user)):
     db = get_db()
     orders = db.select(
         "orders",
@@ -81,7 +137,7 @@ async def list_orders(user: dict = Depends(get_current_user)):
 
 
 @router.get("/{order_id}")
-async def get_order(order_id: str, user: dict = Depends(get_current_user)):
+def get_order(order_id: str, user: dict = Depends(get_current_user)):
     db = get_db()
     order = db.select(
         "orders",
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Query, HTTPException
-from config import get_db
+import json
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from config import get_db, get_settings
+from catalog import feed
+from recommendations import recommender
 from typing import Literal
 
 router = APIRouter()
 
 
 @router.get("")
-async def list_products(
+def list_products(
     category: str | None = Query(None),
     search: str | None = Query(None),
     sort: Literal["featured", "newest", "price_asc", "price_desc", "rating"] = Query("featured"),
@@ -37,10 +41,53 @@ async def list_products(
     return {"products": products, "count": len(products)}
 
 
+@router.get("/stream")
+async def stream_products(request: Request):
+    """
+    Server-Sent Events feed of catalog changes.
+    Sends one `snapshot` event, then `delta` events keyed by product id.
+    """
+    if not feed.products:
+        await feed.refresh()
+    keepalive = get_settings().sse_keepalive_interval
+
+    async def events():
+        sub = feed.subscribe()
+        try:
+            yield f"event: snapshot\ndata: {json.dumps(feed.tracked_snapshot())}\n\n"
+            while not await request.is_disconnected():
+                delta = await sub.next(keepalive)
+                if delta:
+                    yield f"event: delta\ndata: {json.dumps(delta)}\n\n"
+                else:
+                    yield ": keep-alive\n\n"
+        finally:
+            feed.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{product_id}")
-async def get_product(product_id: str):
+def get_product(product_id: str):
     db = get_db()
     product = db.select("products", filters={"id": f"eq.{product_id}"}, single=True)
     if not product:
         raise HTTPException(status_code=404, detail=f"Product '{product_id}' not found")
     return product
+
+
+@router.get("/{product_id}/related")
+def related_products(product_id: str, limit: int = Query(4, ge=1, le=20)):
+    """Frequently bought together: ids from the in-memory co-occurrence index, details from one select."""
+    scores = dict(recommender.related(product_id, limit))
+    related = []
+    if scores:
+        ids = ",".join(f'"{pid}"' for pid in scores)
+        rows = get_db().select("products", filters={"id": f"in.({ids})"}) or []
+        related = sorted(({**row, "score": scores[row["id"]]} for row in rows),
+                         key=lambda p: p["score"], reverse=True)
+    return {"product_id": product_id, "related": related, "count": len(related)}
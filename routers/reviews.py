@@ -12,7 +12,7 @@ class ReviewRequest(BaseModel):
 
 
 @router.get("/{product_id}")
-async def list_reviews(product_id: str, user: dict | None = Depends(get_optional_user)):
+def list_reviews(product_id: str, user: dict | None = Depends(get_optional_user)):
     db = get_db()
     prod = db.select("products", columns="id,rating,review_count", filters={"id": f"eq.{product_id}"})
     if not prod:
@@ -38,7 +38,7 @@ async def list_reviews(product_id: str, user: dict | None = Depends(get_optional
 
 
 @router.post("/{product_id}", status_code=status.HTTP_201_CREATED)
-async def post_review(product_id: str, body: ReviewRequest, user: dict = Depends(get_current_user)):
+def post_review(product_id: str, body: ReviewRequest, user: dict = Depends(get_current_user)):
     if not (1 <= body.rating <= 5):
         raise HTTPException(status_code=422, detail="Rating must be between 1 and 5")
 
@@ -62,7 +62,7 @@ async def post_review(product_id: str, body: ReviewRequest, user: dict = Depends
 
 
 @router.delete("/{review_id}")
-async def delete_review(review_id: str, user: dict = Depends(get_current_user)):
+def delete_review(review_id: str, user: dict = Depends(get_current_user)):
     db = get_db()
     review = db.select("reviews", columns="id,user_id", filters={"id": f"eq.{review_id}"})
     if not review:
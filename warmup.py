@@ -0,0 +1,112 @@
+"""
+warmup.py — Startup warm-up and readiness state.
+Runs once per process in the background: opens upstream connections,
+preloads the product catalog and optionally exercises key routes.
+`/ready` reports 503 until this has finished and upstream is reachable.
+The recommendation index is built by a separate task that does not gate
+readiness; until it finishes, /related simply returns no suggestions.
+"""
+
+import asyncio
+import httpx
+from config import get_db, get_settings, get_http_client, get_async_http_client
+from capture import INTERNAL_HEADER
+from catalog import feed
+from recommendations import recommender
+
+RETRY_DELAY = 5.0
+
+
+class WarmupState:
+    def __init__(self):
+        self.done = False
+        self.error: str | None = None
+        self.task: asyncio.Task | None = None
+        self.index_task: asyncio.Task | None = None
+        self.index_error: str | None = None
+
+
+state = WarmupState()
+
+
+async def _open_connections() -> None:
+    s = get_settings()
+    db = get_db()
+    # Concurrent requests force the pools to open several keep-alive sockets
+    await asyncio.gather(*(
+        asyncio.to_thread(db.select, "products", columns="id", limit=1)
+        for _ in range(s.warmup_connections)
+    ))
+    await asyncio.gather(*(
+        get_async_http_client().get(f"{s.supabase_url}/auth/v1/health",
+                                    headers={"apikey": s.supabase_anon_key})
+        for _ in range(s.warmup_connections)
+    ))
+
+
+async def _prime_routes(app) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://warmup",
+                                 headers={INTERNAL_HEADER: "warmup"}) as client:
+        (await client.get("/products")).raise_for_status()
+        (await client.get("/products", params={"sort": "price_asc"})).raise_for_status()
+        first = next(iter(feed.products), None)
+        if first:
+            (await client.get(f"/products/{first}")).raise_for_status()
+            (await client.get(f"/reviews/{first}")).raise_for_status()
+
+
+async def run(app) -> None:
+    """Retries until every warm-up step succeeds once."""
+    while True:
+        try:
+            await _open_connections()
+            await feed.refresh()
+            if get_settings().warmup_routes:
+                await _prime_routes(app)
+        except Exception as e:
+            state.error = str(e) or type(e).__name__
+            await asyncio.sleep(RETRY_DELAY)
+            continue
+        state.done = True
+        state.error = None
+        return
+
+
+async def build_index() -> None:
+    """Retries the full order_items scan until it succeeds once."""
+    while True:
+        try:
+            await asyncio.to_thread(recommender.build)
+        except Exception as e:
+            state.index_error = str(e) or type(e).__name__
+            await asyncio.sleep(RETRY_DELAY)
+            continue
+        state.index_error = None
+        return
+
+
+def start(app) -> None:
+    state.task = asyncio.create_task(run(app))
+    state.index_task = asyncio.create_task(build_index())
+
+
+async def stop() -> None:
+    for task in (state.task, state.index_task):
+        if task:
+            task.cancel()
+    get_http_client().close()
+    await get_async_http_client().aclose()
+    get_http_client.cache_clear()
+    get_async_http_client.cache_clear()
+
+
+async def upstream_reachable(timeout: float = 2.0) -> bool:
+    """Cheap PostgREST round trip used by the readiness probe."""
+    try:
+        await asyncio.wait_for(
+            asyncio.to_thread(get_db().select, "products", columns="id", limit=1), timeout
+        )
+    except Exception:
+        return False
+    return True